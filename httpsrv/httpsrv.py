@@ -1,11 +1,100 @@
 '''
 Httpsrv is a simple HTTP server for API mocking during automated testing
 '''
+import os
+import re
+import sys
 import json
-
-from threading import Thread
+import math
+import socket
+import asyncio
+
+from itertools import count
+from collections import OrderedDict
+from threading import Thread, Lock, Event
+from socketserver import ThreadingMixIn
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
+try:
+    import httptools
+except ImportError:
+    httptools = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_PROTOCOL_VERSION = 'HTTP/1.1'
+
+_ENGINES = ('stdlib', 'httptools')
+
+# no match responses quote at most this many bytes of the request body
+_QUOTED_BODY_LIMIT = 65536
+
+_NOT_PARSED = object()
+_INVALID_JSON = object()
+_JSON_START = re.compile(rb'[ \t\r\n]*(?:[{\["\-0-9]|true|false|null)')
+
+
+# integers of 19 digits and more may not fit orjson's 64 bits and be parsed as floats
+_LONG_NUMBER = re.compile(rb'[0-9]{19}')
+
+
+def _stdlib_dumps(doc):
+    return json.dumps(doc).encode('utf-8')
+
+
+def _stdlib_loads(bytes):
+    return json.loads(bytes.decode('utf-8'))
+
+
+def _has_non_finite(doc):
+    if isinstance(doc, float):
+        return not math.isfinite(doc)
+    if isinstance(doc, dict):
+        return any(_has_non_finite(value) for value in doc.values())
+    if isinstance(doc, (list, tuple)):
+        return any(_has_non_finite(value) for value in doc)
+    return False
+
+
+if orjson:
+    def _dumps(doc):
+        '''
+        Serializes with orjson, falling back to :mod:`json` for documents orjson
+        can not represent the same way: integers beyond 64 bits raise and
+        ``NaN`` or ``Infinity`` would silently become ``null``
+        '''
+        try:
+            dumped = orjson.dumps(doc, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return _stdlib_dumps(doc)
+        if b'null' in dumped and _has_non_finite(doc):
+            return _stdlib_dumps(doc)
+        return dumped
+
+    def _loads(bytes):
+        '''
+        Parses with orjson unless the document may hold integers beyond 64 bits
+        or orjson rejects it, e.g. for ``NaN``, in which case :mod:`json` parses it
+        '''
+        if _LONG_NUMBER.search(bytes):
+            return _stdlib_loads(bytes)
+        try:
+            return orjson.loads(bytes)
+        except ValueError:
+            return _stdlib_loads(bytes)
+else:
+    _dumps = _stdlib_dumps
+    _loads = _stdlib_loads
+
 
 class PendingRequestsLeftException(Exception):
     '''
@@ -16,43 +105,149 @@ class PendingRequestsLeftException(Exception):
 
 
 class _Expectation:
+    __slots__ = ('method', 'path', 'headers', 'bytes', 'json', 'json_forms', 'key',
+                 'header_items', 'matches_content')
+
     def __init__(self, method, path, headers, text, json):
-        self.method = method
-        self.path = path
+        self.method = sys.intern(method)
+        self.path = sys.intern(path) if path else None
         self.headers = headers or {}
         self.bytes = text.encode('utf-8') if text else None
         self.json = json
+        self.json_forms = _serialized_forms(json) if json else ()
+        self.key = (self.method, self.path)
+        self.header_items = tuple(
+            (sys.intern(name.lower()), value) for name, value in self.headers.items())
+        self.matches_content = self._content_matcher()
 
-    def matches(self, method, path, headers, bytes):
-        return (self.method == method
-                and self._match_path(path)
-                and self._match_headers(headers)
-                and self._match_body(bytes))
+    @property
+    def needs_body(self):
+        return bool(self.json or self.bytes)
+
+    def matches(self, request):
+        return (self.method == request.method
+                and self._match_path(request.path)
+                and self.matches_content(request))
+
+    def _content_matcher(self):
+        '''
+        Picks only the checks this expectation needs once instead of
+        branching over unused ones on every request
+        '''
+        checks = []
+        if self.header_items:
+            checks.append(self._match_headers)
+        if self.json:
+            checks.append(self._match_json)
+        elif self.bytes:
+            checks.append(self._match_bytes)
+        if not checks:
+            return _match_any_content
+        if len(checks) == 1:
+            return checks[0]
+        match_headers, match_body = checks
+        return lambda request: match_headers(request) and match_body(request)
 
     def _match_path(self, path):
         return self.path == path if self.path else True
 
-    def _match_headers(self, headers):
-        for name, value in self.headers.items():
-            if not (name in headers and value == headers[name]):
+    def _match_headers(self, request):
+        headers = request.headers
+        for name, value in self.header_items:
+            if headers.get(name) != value:
                 return False
         return True
 
-    def _match_body(self, bytes):
-        if not self.json:
-            return bytes == self.bytes if self.bytes else True
+    def _match_json(self, request):
+        return request.bytes in self.json_forms or self.json == request.json
+
+    def _match_bytes(self, request):
+        return request.bytes == self.bytes
+
+
+def _match_any_content(request):
+    return True
+
+
+def _serialized_forms(doc):
+    '''
+    Byte strings a client most likely sends for ``doc``: python's default
+    ``json.dumps`` output and the compact form of ``JSON.stringify``.
+    A request body equal to one of them matches without being parsed.
+    Forms that would not parse back to ``doc`` are left out
+    '''
+    forms = []
+    for separators in ((', ', ': '), (',', ':')):
+        try:
+            form = json.dumps(doc, separators=separators)
+        except (TypeError, ValueError):
+            continue
+        if json.loads(form) == doc:
+            forms.append(form.encode('utf-8'))
+    return tuple(forms)
+
+
+class _Request:
+    '''
+    Incoming request as seen by expectations. Headers may be any mapping which
+    ``get()`` accepts lowercase names, e.g. the handler's own :class:`http.client.HTTPMessage`.
+    The body is parsed as JSON at most once no matter how many rules expect JSON
+    '''
+    __slots__ = ('method', 'path', 'headers', 'bytes', '_json')
+
+    def __init__(self, method, path, headers, bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.bytes = bytes
+        self._json = _NOT_PARSED
+
+    @property
+    def json(self):
+        if self._json is _NOT_PARSED:
+            self._json = self._parse_json()
+        return self._json
+
+    def _parse_json(self):
+        if self.bytes is None or not _JSON_START.match(self.bytes):
+            return _INVALID_JSON
         try:
-            parsed = json.loads(bytes.decode('utf8'))
-            return self.json == parsed
+            return _loads(self.bytes)
         except ValueError:
-            return False
+            return _INVALID_JSON
+
+
+def _lowercase_names(headers):
+    return {name.lower(): value for name, value in headers.items()}
 
 
 class _Response:
-    def __init__(self, code=200, headers=None, bytes=None):
+    __slots__ = ('code', 'headers', 'bytes', 'file', 'length', 'close', 'head', 'wire')
+
+    def __init__(self, code=200, headers=None, bytes=None, file=None):
         self.code = code
         self.headers = headers or {}
+        if not self._allows_body():
+            # a body sent anyway would be read as the start of the next response
+            bytes, file = None, None
         self.bytes = bytes
+        self.file = file
+        self.close = _lowercase_names(self.headers).get('connection', '').lower() == 'close'
+        self.length = os.path.getsize(file) if file else len(bytes or b'')
+        self.head = self._serialize_head(self.length)
+        self.wire = self.head + (bytes or b'')
+
+    def _serialize_head(self, length):
+        reason = BaseHTTPRequestHandler.responses.get(self.code, ('',))[0]
+        lines = ['%s %d %s' % (_PROTOCOL_VERSION, self.code, reason)]
+        lines.extend('%s: %s' % header for header in self.headers.items())
+        names = {name.lower() for name in self.headers}
+        if 'content-length' not in names and self._allows_body():
+            lines.append('Content-Length: %d' % length)
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1', 'strict')
+
+    def _allows_body(self):
+        return self.code >= 200 and self.code not in (204, 304)
 
 
 class Rule:
@@ -77,6 +272,8 @@ class Rule:
     :param json: request json to expect. If ommited any json will match,
         if present text param will be ignored
     '''
+    __slots__ = ('_expectation', 'response')
+
     def __init__(self, method, path, headers, text, json):
         self._expectation = _Expectation(method, path, headers, text, json)
         self.response = None
@@ -116,6 +313,28 @@ class Rule:
         self.response = _Response(status, headers, text.encode('utf8'))
         return self
 
+    def file(self, path, status=200, headers=None):
+        '''
+        Respond with given status and contents of a file. The file is read each time
+        the rule responds; the ``'stdlib'`` engine hands it to the socket with ``sendfile``
+        so large bodies are not copied through python
+
+        :type path: str
+        :param path: path to the file to respond with. Its size is taken when this
+            method is called, so the file should not change while the rule is active
+
+        :type status: int
+        :param status: status code to return
+
+        :type headers: dict
+        :param headers: dictionary of headers to add to response
+
+        :returns: itself
+        :rtype: Rule
+        '''
+        self.response = _Response(status, headers, file=path)
+        return self
+
     def json(self, json_doc, status=200, headers=None):
         '''
         Respond with given status and JSON content. Will also set ``'Content-Type'`` to
@@ -133,7 +352,8 @@ class Rule:
         headers = headers or {}
         if 'content-type' not in headers:
             headers['content-type'] = 'application/json'
-        return self.text(json.dumps(json_doc), status, headers)
+        self.response = _Response(status, headers, _dumps(json_doc))
+        return self
 
     def matches(self, method, path, headers, bytes=None):
         '''
@@ -147,13 +367,20 @@ class Rule:
         :param path: request path including query parameters,
             e.g. ``'/users?name=John%20Doe'``
 
+        :type headers: dict
+        :param headers: request headers, names are compared case-insensitively
+
         :type bytes: bytes
         :param bytes: request body
 
         :returns: ``True`` if this rule matches given params
         :rtype: bool
         '''
-        return self._expectation.matches(method, path, headers, bytes)
+        request = _Request(method, path, _lowercase_names(headers), bytes)
+        return self._expectation.matches(request)
+
+    def _matches_content(self, request):
+        return self._expectation.matches_content(request)
 
     @property
     def method(self):
@@ -165,21 +392,318 @@ class Rule:
         '''
         return self._expectation.method
 
+    @property
+    def path(self):
+        '''
+        Path this rule will respond to, ``None`` if any path will do
+
+        :returns: expected path including query parameters
+        :rtype: str
+        '''
+        return self._expectation.path
+
+    @property
+    def _key(self):
+        return self._expectation.key
+
+    @property
+    def _needs_body(self):
+        return self._expectation.needs_body
+
+
+class _Bucket:
+    __slots__ = ('once', 'always', 'with_body')
+
+    def __init__(self):
+        self.once = OrderedDict()
+        self.always = OrderedDict()
+        self.with_body = 0
+
+
+class _RuleIndex:
+    '''
+    Rules bucketed by ``(method, path)`` so that a request is only matched against
+    rules registered for its exact endpoint and rules that accept any path.
+    Method and path are settled by the bucket lookup, so rules inside a bucket
+    only compare headers and body. Registration order is preserved across both buckets.
+
+    Each bucket keeps one-time and always rules side by side, so a single lookup
+    serves both kinds. One-time rules are ordered dicts keyed by rule id so a served
+    rule is removed in constant time. Buckets also count rules looking at request bodies
+    so engines only keep a body when a rule for that endpoint compares it.
+
+    All operations are guarded by a lock as requests are served from multiple threads
+    '''
+    def __init__(self):
+        self._buckets = {}
+        self._order = {}
+        self._counter = count()
+        self._lock = Lock()
+
+    def needs_body(self, method, path):
+        '''
+        Tells if any rule a request with given method and path can match compares bodies
+        '''
+        for key in ((method, path), (method, None)):
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.with_body:
+                return True
+        return False
+
+    def add(self, rule, always=False):
+        with self._lock:
+            bucket = self._buckets.get(rule._key)
+            if bucket is None:
+                bucket = self._buckets[rule._key] = _Bucket()
+            rules = bucket.always if always else bucket.once
+            rules[id(rule)] = rule
+            self._order[rule] = next(self._counter)
+            bucket.with_body += rule._needs_body
+
+    def take(self, request):
+        '''
+        Finds a matching rule, one-time rules first. A matching one-time rule is removed
+        in the same step so that concurrent requests can never be served by it twice
+        '''
+        with self._lock:
+            exact = self._buckets.get((request.method, request.path))
+            anywhere = self._buckets.get((request.method, None))
+            rule = self._find(exact, anywhere, 'once', request)
+            if rule:
+                self._remove(rule)
+                return rule
+            return self._find(exact, anywhere, 'always', request)
+
+    def _remove(self, rule):
+        key = rule._key
+        bucket = self._buckets[key]
+        del bucket.once[id(rule)]
+        bucket.with_body -= rule._needs_body
+        if not (bucket.once or bucket.always):
+            del self._buckets[key]
+        del self._order[rule]
+
+    def _find(self, exact, anywhere, kind, request):
+        exact_rule = self._find_in(exact, kind, request)
+        anywhere_rule = self._find_in(anywhere, kind, request)
+        if exact_rule and anywhere_rule:
+            return min(exact_rule, anywhere_rule, key=self._order.__getitem__)
+        return exact_rule or anywhere_rule
+
+    @staticmethod
+    def _find_in(bucket, kind, request):
+        if bucket is None:
+            return None
+        for rule in getattr(bucket, kind).values():
+            if rule._matches_content(request):
+                return rule
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._order.clear()
+
+    def is_pending(self, rule):
+        bucket = self._buckets.get(rule._key)
+        return bucket is not None and id(rule) in bucket.once
+
+    def has_pending(self):
+        return any(bucket.once for bucket in list(self._buckets.values()))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    '''
+    Shuts down keep-alive connections left open by clients when the server is closed,
+    otherwise their handler threads would keep serving a stopped server's rules
+    '''
+    daemon_threads = True
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self._connections = set()
+
+    def get_request(self):
+        connection, address = super().get_request()
+        self._connections.add(connection)
+        return connection, address
+
+    def shutdown_request(self, request):
+        self._connections.discard(request)
+        super().shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        for connection in list(self._connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _HttptoolsProtocol(asyncio.Protocol):
+    def __init__(self, rules, connections):
+        self._rules = rules
+        self._connections = connections
+        self._transport = None
+        self._parser = None
+        self._url = None
+        self._method = None
+        self._path = None
+        self._headers = None
+        self._body = None
+        self._quoted = 0
+        self._needs_body = False
+
+    def connection_made(self, transport):
+        self._transport = transport
+        self._parser = httptools.HttpRequestParser(self)
+        self._connections.add(transport)
+
+    def connection_lost(self, exc):
+        self._connections.discard(self._transport)
+
+    def data_received(self, data):
+        try:
+            self._parser.feed_data(data)
+        except httptools.HttpParserUpgrade as upgrade:
+            self._ignore_upgrade(data[upgrade.args[0]:])
+        except httptools.HttpParserError:
+            self._transport.write(_Response(400).wire)
+            self._transport.close()
+
+    def _ignore_upgrade(self, rest):
+        '''
+        The request asking for an upgrade, e.g. ``Upgrade: h2c``, is already answered
+        as a plain HTTP/1.1 one, so the connection goes on with a fresh parser.
+        A ``CONNECT`` tunnel can not be refused that way and its connection is closed
+        '''
+        if self._method == 'CONNECT':
+            self._transport.close()
+        if self._transport.is_closing():
+            return
+        self._parser = httptools.HttpRequestParser(self)
+        if rest:
+            self.data_received(rest)
+
+    def on_message_begin(self):
+        self._url = []
+        self._headers = {}
+        self._body = []
+        self._quoted = 0
+
+    def on_url(self, url):
+        self._url.append(url)
+
+    def on_header(self, name, value):
+        self._headers[name.decode('latin-1').lower()] = value.decode('latin-1')
+
+    def on_headers_complete(self):
+        self._method = sys.intern(self._parser.get_method().decode('latin-1'))
+        self._path = b''.join(self._url).decode('latin-1')
+        self._needs_body = self._rules.needs_body(self._method, self._path)
+
+    def on_body(self, body):
+        if not self._needs_body:
+            # only the prefix a no match response quotes is kept
+            body = body[:_QUOTED_BODY_LIMIT - self._quoted]
+            if not body:
+                return
+            self._quoted += len(body)
+        self._body.append(body)
+
+    def on_message_complete(self):
+        method, path = self._method, self._path
+        body = b''.join(self._body) if self._needs_body and self._body else None
+        request = _Request(method, path, self._headers, body)
+        rule = self._rules.take(request)
+        if rule:
+            response = rule.response
+        else:
+            if not self._needs_body:
+                body = b''.join(self._body) or None
+            requestline = '%s %s HTTP/%s' % (method, path, self._parser.get_http_version())
+            response = _no_match_response(requestline, body)
+        if method == 'HEAD':
+            self._transport.write(response.head)
+        else:
+            self._transport.write(response.wire)
+            if response.file:
+                with open(response.file, 'rb') as file:
+                    self._transport.write(file.read(response.length))
+        if response.close or not self._parser.should_keep_alive():
+            self._transport.close()
+
+
+class _HttptoolsServer:
+    '''
+    Asyncio server parsing requests with httptools, running on uvloop when it is installed.
+    Mirrors the ``serve_forever``, ``shutdown`` and ``server_close`` methods of :class:`HTTPServer`.
+
+    The loop is only ever run by the server thread; :meth:`shutdown` stops it with
+    ``call_soon_threadsafe`` and :meth:`server_close` closes connections left open
+    by clients so that restarting servers in a long test run does not leak sockets
+    '''
+    def __init__(self, address, rules):
+        self._loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        self._stopped = Event()
+        self._connections = set()
+        self._server = self._loop.run_until_complete(self._loop.create_server(
+            lambda: _HttptoolsProtocol(rules, self._connections), *address))
+
+    def serve_forever(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._stopped.set()
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._stopped.wait()
+
+    def server_close(self):
+        self._server.close()
+        for transport in list(self._connections):
+            transport.close()
+        self._loop.run_until_complete(asyncio.sleep(0))
+        self._loop.close()
+
+
+def _no_match_response(requestline, body):
+    message = b''.join((b'No matching rule found for ', requestline.encode('latin-1'),
+                        b' body ', (body or b'')[:_QUOTED_BODY_LIMIT]))
+    return _Response(500, {'content-type': 'text/plain'}, message)
+
 
 class Server:
     '''
     Tunable HTTP server running in a parallel thread.
 
-    Please note that `this server is not thread-safe` which should not cause any troubles
-    in common use-cases due to python single-threaded nature.
+    With the default engine every connection is handled in its own thread, so concurrent
+    clients are served in parallel. Each one-time rule is still guaranteed to respond only once.
 
     :type port: int
     :param port: port this server will listen to after :func:`Server.start` is called
+
+    :type engine: str
+    :param engine: ``'stdlib'`` to serve requests with :mod:`http.server` or ``'httptools'``
+        to serve them from an asyncio loop using the httptools C parser. The loop is
+        a uvloop one if uvloop is installed. Falls back to ``'stdlib'`` if httptools is not installed
+
+    :type quiet: bool
+    :param quiet: suppresses the access log the ``'stdlib'`` engine writes to stderr
+        for every request. The ``'httptools'`` engine never logs
+
+    :raises: :class:`ValueError` if the engine is neither ``'stdlib'`` nor ``'httptools'``
     '''
-    def __init__(self, port):
+    def __init__(self, port, engine='stdlib', quiet=True):
+        if engine not in _ENGINES:
+            raise ValueError('Unknown engine %r, expected one of %s' % (engine, ', '.join(_ENGINES)))
         self._port = port
-        self._rules = []
-        self._always_rules = []
+        self._engine = engine
+        self._quiet = quiet
+        self._rules = _RuleIndex()
         self._thread = None
         self._server = None
         self._handler = None
@@ -209,7 +733,8 @@ class Server:
         :returns: newly created expectation rule
         '''
         rule = Rule(method, path, headers, text, json)
-        return self._add_rule_to(rule, self._always_rules)
+        self._rules.add(rule, always=True)
+        return rule
 
     # pylint: disable=invalid-name
     def on(self, method, path=None, headers=None, text=None, json=None):
@@ -236,14 +761,9 @@ class Server:
         :returns: newly created expectation rule
         '''
         rule = Rule(method, path, headers, text, json)
-        return self._add_rule_to(rule, self._rules)
-    # pylint: enable=invalid-name
-
-    def _add_rule_to(self, rule, rules):
-        rules.append(rule)
-        if rule.method not in self._handler.known_methods:
-            self._handler.add_method(rule.method)
+        self._rules.add(rule)
         return rule
+    # pylint: enable=invalid-name
 
     def start(self):
         '''
@@ -253,13 +773,18 @@ class Server:
         :rtype: Server
         :returns: server instance for chaining
         '''
-        self._handler = _create_handler_class(self._rules, self._always_rules)
-        self._server = HTTPServer(('', self._port), self._handler)
+        self._handler = _create_handler_class(self._rules, self._quiet)
+        self._server = self._create_server(('', self._port))
         self._thread = Thread(target=self._server.serve_forever, daemon=True)
         self._thread.start()
         self.running = True
         return self
 
+    def _create_server(self, address):
+        if self._engine == 'httptools' and httptools:
+            return _HttptoolsServer(address, self._rules)
+        return _ThreadingHTTPServer(address, self._handler)
+
     def stop(self):
         '''
         Shuts the server down and waits for server thread to join
@@ -275,7 +800,6 @@ class Server:
         in ``teardDown()`` test method instead of time-consuming restart procedure
         '''
         self._rules.clear()
-        self._always_rules.clear()
 
     def assert_no_pending(self, target_rule=None):
         '''
@@ -293,63 +817,89 @@ class Server:
         :raises: :class:`PendingRequestsLeftException`
         '''
         if target_rule:
-            if target_rule in self._rules:
+            if self._rules.is_pending(target_rule):
                 raise PendingRequestsLeftException()
-        elif self._rules:
+        elif self._rules.has_pending():
             raise PendingRequestsLeftException()
 
 
-def _create_handler_class(rules, always_rules):
+def _create_handler_class(rules, quiet):
     class _Handler(BaseHTTPRequestHandler):
-        known_methods = set()
+        protocol_version = _PROTOCOL_VERSION
+        disable_nagle_algorithm = True
+
+        if quiet:
+            def log_request(self, code='-', size='-'):
+                pass
 
-        @classmethod
-        def add_method(cls, method):
+            def log_message(self, format, *args):
+                pass
+
+        def handle_one_request(self):
             '''
-            Adds a handler function for HTTP method provided
+            Same as :meth:`BaseHTTPRequestHandler.handle_one_request` but sends every
+            method straight to the rules instead of looking up a ``do_<METHOD>`` handler
             '''
-            if method in cls.known_methods:
-                return
-            func = lambda self: cls._handle(self, method)
-            setattr(cls, 'do_' + method, func)
-            cls.known_methods.add(method)
-
-        def _read_body(self):
+            try:
+                self.raw_requestline = self.rfile.readline(65537)
+                if len(self.raw_requestline) > 65536:
+                    self.requestline = ''
+                    self.request_version = ''
+                    self.command = ''
+                    self.send_error(414)
+                    return
+                if not self.raw_requestline:
+                    self.close_connection = True
+                    return
+                if self.parse_request():
+                    self._handle(self.command)
+                    self.wfile.flush()
+            except socket.timeout as error:
+                self.log_error('Request timed out: %r', error)
+                self.close_connection = True
+
+        def _read_body(self, limit=None):
             if 'content-length' in self.headers:
                 length = int(self.headers['content-length'])
+                if limit is not None:
+                    length = min(length, limit)
                 return self.rfile.read(length) if length > 0 else None
             return None
 
+        def _discard_body(self, read=0):
+            length = int(self.headers.get('content-length', 0)) - read
+            while length > 0:
+                chunk = self.rfile.read(min(length, 65536))
+                if not chunk:
+                    return
+                length -= len(chunk)
+
         def _respond(self, response):
-            self.send_response(response.code)
-            for key, value in response.headers.items():
-                self.send_header(key, value)
-            self.end_headers()
-            if response.bytes:
-                self.wfile.write(response.bytes)
+            self.log_request(response.code)
+            if response.close:
+                self.close_connection = True
+            if self.command == 'HEAD':
+                self.connection.sendall(response.head)
+                return
+            self.connection.sendall(response.wire)
+            if response.file:
+                with open(response.file, 'rb') as file:
+                    self.connection.sendfile(file, 0, response.length)
 
         def _handle(self, method):
-            body = self._read_body()
-            rule = self._respond_with_rules(method, body, rules)
+            if 'transfer-encoding' in self.headers:
+                # chunked bodies are not read, the connection can not be reused after them
+                self.close_connection = True
+            needs_body = rules.needs_body(method, self.path)
+            body = self._read_body() if needs_body else None
+            rule = rules.take(_Request(method, self.path, self.headers, body))
             if rule:
-                rules.remove(rule)
-                return
-            always_rule = self._respond_with_rules(method, body, always_rules)
-            if always_rule:
-                return
-            return self.send_error(
-                500, 'No matching rule found for ' + self.requestline + ' body ' + str(body))
-
-        def _respond_with_rules(self, method, body, rules):
-            matching_rules = [r for r in rules if r.matches(method, self.path, dict(self.headers), body)]
-            if matching_rules:
-                rule = matching_rules[0]
-                self._respond(rule.response)
-                return rule
-            return None
-
-
-    for rule in rules:
-        _Handler.add_method(rule.method)
+                if not needs_body:
+                    self._discard_body()
+                return self._respond(rule.response)
+            if not needs_body:
+                body = self._read_body(_QUOTED_BODY_LIMIT)
+                self._discard_body(len(body or b''))
+            return self._respond(_no_match_response(self.requestline, body))
 
     return _Handler
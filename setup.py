@@ -30,12 +30,13 @@ setup(
         'Topic :: Software Development :: Testing',
         'License :: OSI Approved :: MIT License',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
     ],
+    python_requires='>=3.5',
     keywords='api http mock testing',
     extras_require={
         'test': ['requests'],
+        'httptools': ['httptools', 'uvloop; sys_platform != "win32"'],
+        'orjson': ['orjson'],
     },
 )
@@ -1,11 +1,70 @@
-# pylint: disable=missing-docstring,invalid-name
+# pylint: disable=missing-docstring,invalid-name,global-statement
+import io
+import os
 import json
+import socket
+import tempfile
 import unittest
+from contextlib import redirect_stderr
+from concurrent.futures import ThreadPoolExecutor
 import requests
+try:
+    import httptools
+except ImportError:
+    httptools = None
 from httpsrv import Server, PendingRequestsLeftException
 
 
-server = Server(8080).start()
+# pytest-xdist workers get their own block of ports so they can run in parallel
+WORKER = int(os.environ.get('PYTEST_XDIST_WORKER', 'gw0')[2:])
+PORT = 8080 + 10 * WORKER
+URL = 'http://localhost:%d' % PORT
+HTTPTOOLS_URL = 'http://localhost:%d' % (PORT + 1)
+
+server = None
+httptools_server = None
+session = requests.Session()
+
+
+def setUpModule():
+    global server, httptools_server
+    server = Server(PORT).start()
+    httptools_server = Server(PORT + 1, engine='httptools').start()
+
+
+def tearDownModule():
+    session.close()
+    server.stop()
+    httptools_server.stop()
+
+
+def exchange(port, first_method='GET', first_headers=b''):
+    '''
+    Sends a request and a GET over one connection, returns all bytes received until
+    the server closes it after the GET
+    '''
+    return send_raw(port, first_method.encode() + b' / HTTP/1.1\r\nHost: localhost\r\n'
+                    + first_headers + b'\r\n'
+                    b'GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+
+
+def send_raw(port, data):
+    '''
+    Sends raw bytes over a new connection, returns all bytes received until
+    the server closes it
+    '''
+    client = socket.create_connection(('localhost', port))
+    try:
+        client.settimeout(5)
+        client.sendall(data)
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+    finally:
+        client.close()
 
 
 class ServerTest(unittest.TestCase):
@@ -16,44 +75,56 @@ class ServerTest(unittest.TestCase):
 class TextResponses(ServerTest):
     def test_should_launch_http_server(self):
         server.on('GET', '/').text('hello')
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.text, 'hello')
 
     def test_should_reset_server_state(self):
         server.on('GET', '/').text('Hello')
         server.reset()
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.status_code, 500)
 
     def test_should_serve_multiple_responses_to_same_url(self):
         server.on('GET', '/').text('Hello')
         server.on('GET', '/').text('Goodbye')
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.text, 'Hello')
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.text, 'Goodbye')
 
     def test_should_serve_multiple_responses_to_different_urls(self):
         server.on('GET', '/').text('Hello')
         server.on('POST', '/foo').text('Bar')
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.text, 'Hello')
-        res = requests.post('http://localhost:8080/foo')
+        res = session.post(URL + '/foo')
         self.assertEqual(res.text, 'Bar')
 
     def test_should_respond_500_if_no_rule_matches(self):
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.status_code, 500)
 
+    def test_should_describe_unmatched_request(self):
+        res = session.post(URL + '/foo', data='bar')
+        self.assertEqual(res.text, 'No matching rule found for POST /foo HTTP/1.1 body bar')
+
+    def test_should_quote_limited_prefix_of_unmatched_request_body(self):
+        res = session.post(URL + '/foo', data=b'x' * 1000000)
+        self.assertEqual(res.text, 'No matching rule found for POST /foo HTTP/1.1 body '
+                         + 'x' * 65536)
+        server.on('POST', '/foo').text('hello')
+        res = session.post(URL + '/foo', data='bar')
+        self.assertEqual(res.text, 'hello')
+
     def test_should_match_by_query_parameters(self):
         server.on('GET', '/user?name=John').text('John Doe')
-        res = requests.get('http://localhost:8080/user?name=John')
+        res = session.get(URL + '/user?name=John')
         self.assertEqual(res.text, 'John Doe')
 
     def test_should_set_header(self):
         headers = {'x-header': 'some'}
         server.on('GET', '/').text('hello', headers=headers)
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.headers['x-header'], 'some')
 
     def test_should_raise_if_pending_requetss_left(self):
@@ -64,13 +135,13 @@ class TextResponses(ServerTest):
     def test_should_not_raise_if_specific_pending_requets_left(self):
         resolved_rule = server.on('GET', '/').text('hello')
         pending_rule = server.on('GET', '/pending').text('nope')
-        requests.get('http://localhost:8080/')
+        session.get(URL + '/')
         server.assert_no_pending(resolved_rule)
 
     def test_should_raise_if_target_rule_left_unresolved(self):
         resolved_rule = server.on('GET', '/').text('hello')
         pending_rule = server.on('GET', '/pending').text('nope')
-        requests.get('http://localhost:8080/')
+        session.get(URL + '/')
         with self.assertRaises(PendingRequestsLeftException):
             server.assert_no_pending(pending_rule)
 
@@ -79,60 +150,217 @@ class TextResponses(ServerTest):
 
     def test_should_respond_to_post(self):
         server.on('POST', '/').text('hello')
-        res = requests.post('http://localhost:8080')
+        res = session.post(URL)
         self.assertEqual(res.text, 'hello')
 
     def test_should_expect_post_body(self):
         server.on('POST', '/', text='foo=bar').text('hello')
-        res = requests.post('http://localhost:8080', data='foo=bar')
+        res = session.post(URL, data='foo=bar')
         self.assertEqual(res.text, 'hello')
 
     def test_should_respond_with_text_and_code_201(self):
         server.on('GET', '/').text('hello', status=201)
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.status_code, 201)
 
     def test_should_match_request_headers(self):
         server.on('GET', '/', headers={'Authorization': 'Custom'}).text('hello')
-        res = requests.get('http://localhost:8080', headers={'Authorization': 'Custom'})
+        res = session.get(URL, headers={'Authorization': 'Custom'})
         self.assertEqual(res.text, 'hello')
 
+    def test_should_match_request_header_names_case_insensitively(self):
+        server.on('GET', '/', headers={'X-Token': 'abc'}).text('hello')
+        res = session.get(URL, headers={'x-token': 'abc'})
+        self.assertEqual(res.text, 'hello')
+
+    def test_should_not_match_missing_request_header(self):
+        server.on('GET', '/', headers={'X-Token': 'abc'}).text('hello')
+        res = session.get(URL)
+        self.assertEqual(res.status_code, 500)
+
     def test_should_ignore_request_body(self):
         server.on('POST', '/').text('hello')
-        res = requests.post('http://localhost:8080', data='Foo')
+        res = session.post(URL, data='Foo')
+        self.assertEqual(res.text, 'hello')
+
+    def test_should_ignore_large_request_body(self):
+        server.on('POST', '/').text('hello')
+        res = session.post(URL, data=b'x' * 1000000)
         self.assertEqual(res.text, 'hello')
 
     def test_should_match_json_bosy(self):
         server.on('POST', '/', json=dict(foo='bar')).text('hello')
-        res = requests.post('http://localhost:8080', data='{ "foo": "bar" }')
+        res = session.post(URL, data='{ "foo": "bar" }')
+        self.assertEqual(res.text, 'hello')
+
+    def test_should_match_json_body_sent_by_client_serializer(self):
+        server.on('POST', '/', json=dict(foo='bar', items=[1, 2])).text('hello')
+        res = session.post(URL, json=dict(foo='bar', items=[1, 2]))
         self.assertEqual(res.text, 'hello')
 
     def test_should_not_fall_on_json_parse_error(self):
         server.on('POST', '/', json=dict(foo='bar')).text('hello')
-        res = requests.post('http://localhost:8080', data='{ "foo": }')
+        res = session.post(URL, data='{ "foo": }')
+        self.assertEqual(res.status_code, 500)
+
+    def test_should_not_fall_on_empty_body_when_json_expected(self):
+        server.on('POST', '/', json=dict(foo='bar')).text('hello')
+        res = session.post(URL)
         self.assertEqual(res.status_code, 500)
 
+    def test_should_match_json_body_against_several_json_rules(self):
+        server.on('POST', '/', json=dict(foo='baz')).text('baz')
+        server.on('POST', '/', json=dict(foo='bar')).text('bar')
+        res = session.post(URL, data='{"foo": "bar"}')
+        self.assertEqual(res.text, 'bar')
+
+    def test_should_match_json_body_with_integers_beyond_64_bits(self):
+        server.on('POST', '/', json=dict(id=2 ** 70)).text('exact')
+        server.on('POST', '/', json=dict(id=2 ** 70 + 1)).text('next')
+        res = session.post(URL, data='{ "id": %d }' % (2 ** 70 + 1))
+        self.assertEqual(res.text, 'next')
+
+    def test_should_match_json_body_with_non_finite_numbers(self):
+        server.on('POST', '/', json=dict(foo=float('inf'))).text('hello')
+        res = session.post(URL, data='{ "foo": Infinity }')
+        self.assertEqual(res.text, 'hello')
+
     def test_should_ignore_text_when_json_present(self):
         server.on('POST', '/', json=dict(foo='bar'), text='{ "foo": "bar" }').text('hello')
-        res = requests.post('http://localhost:8080', data='{"foo": "bar"}')
+        res = session.post(URL, data='{"foo": "bar"}')
         self.assertEqual(res.text, 'hello')
 
     def test_should_respond_to_any_options(self):
         server.on('OPTIONS').status(200)
-        res = requests.options('http://localhost:8080/some/url', headers={'foo': 'bar'})
+        res = session.options(URL + '/some/url', headers={'foo': 'bar'})
         self.assertEqual(res.status_code, 200)
 
+    def test_should_treat_empty_path_as_any_path(self):
+        server.on('GET', '').text('any')
+        res = session.get(URL + '/x')
+        self.assertEqual(res.text, 'any')
+
     def test_should_always_respond_to_matching_queries(self):
         server.always('OPTIONS').status(200)
-        res = requests.options('http://localhost:8080/some/url', headers={'foo': 'bar'})
+        res = session.options(URL + '/some/url', headers={'foo': 'bar'})
         self.assertEqual(res.status_code, 200)
-        res = requests.options('http://localhost:8080/some/url', headers={'foo': 'bar'})
+        res = session.options(URL + '/some/url', headers={'foo': 'bar'})
         self.assertEqual(res.status_code, 200)
 
+    def test_should_keep_registration_order_for_any_path_rules(self):
+        server.on('GET').text('any')
+        server.on('GET', '/foo').text('foo')
+        res = session.get(URL + '/foo')
+        self.assertEqual(res.text, 'any')
+        res = session.get(URL + '/foo')
+        self.assertEqual(res.text, 'foo')
+
+    def test_should_serve_each_rule_once_to_concurrent_clients(self):
+        for i in range(10):
+            server.on('GET', '/').text(str(i))
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: requests.get(URL), range(10)))
+        self.assertEqual(sorted(res.text for res in responses), [str(i) for i in range(10)])
+        server.assert_no_pending()
+
+    def test_should_not_send_body_in_response_to_head(self):
+        server.on('HEAD', '/').text('head body')
+        server.on('GET', '/').text('hello')
+        received = exchange(PORT, 'HEAD')
+        self.assertNotIn(b'head body', received)
+        self.assertEqual(received.count(b'HTTP/1.1 200 OK'), 2)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_not_send_no_match_body_in_response_to_head(self):
+        server.on('GET', '/').text('hello')
+        received = exchange(PORT, 'HEAD')
+        self.assertNotIn(b'No matching rule', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_ignore_upgrade_requests(self):
+        server.on('GET', '/').text('upgrade')
+        server.on('GET', '/').text('hello')
+        received = exchange(PORT, first_headers=b'Connection: Upgrade\r\nUpgrade: h2c\r\n')
+        self.assertIn(b'\r\n\r\nupgrade', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_not_send_body_with_no_content_status(self):
+        server.on('GET', '/').text('oops', status=204)
+        server.on('GET', '/').text('hello')
+        received = exchange(PORT)
+        self.assertNotIn(b'oops', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_close_idle_connections_on_stop(self):
+        stopped = Server(PORT + 4)
+        stopped.on('GET', '/').text('hello')
+        stopped.start()
+        client = socket.create_connection(('localhost', PORT + 4))
+        try:
+            client.settimeout(5)
+            client.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            received = b''
+            while not received.endswith(b'hello'):
+                received += client.recv(65536)
+            stopped.stop()
+            self.assertEqual(client.recv(1), b'')
+        finally:
+            client.close()
+
+    def test_should_not_log_requests_by_default(self):
+        server.on('GET', '/').text('hello')
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            session.get(URL)
+        self.assertEqual(stderr.getvalue(), '')
+
+    def test_should_log_requests_unless_quiet(self):
+        loud = Server(PORT + 2, quiet=False)
+        loud.on('GET', '/').text('hello')
+        loud.start()
+        stderr = io.StringIO()
+        try:
+            with redirect_stderr(stderr):
+                requests.get('http://localhost:%d' % (PORT + 2))
+        finally:
+            loud.stop()
+        self.assertIn('"GET / HTTP/1.1" 200 -', stderr.getvalue())
+
+    def test_should_reject_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            Server(PORT + 2, engine='asyncio')
+
+    def test_should_respond_500_to_method_without_rules(self):
+        res = session.request('PATCH', URL)
+        self.assertEqual(res.status_code, 500)
+
+    def test_should_accept_rules_before_start(self):
+        stopped = Server(PORT + 2)
+        stopped.on('GET', '/').text('early')
+        stopped.start()
+        try:
+            res = requests.get('http://localhost:%d' % (PORT + 2))
+            self.assertEqual(res.text, 'early')
+        finally:
+            stopped.stop()
+
+    def test_should_prefer_one_time_rules_over_always_rules(self):
+        server.always('GET', '/').text('always')
+        server.on('GET', '/').text('once')
+        res = session.get(URL)
+        self.assertEqual(res.text, 'once')
+        res = session.get(URL)
+        self.assertEqual(res.text, 'always')
+
+    def test_should_not_count_always_rules_as_pending(self):
+        rule = server.always('GET', '/').text('always')
+        server.assert_no_pending()
+        server.assert_no_pending(rule)
+
     def test_should_reset_always_rules(self):
         server.always('OPTIONS').status(200)
         server.reset()
-        res = requests.options('http://localhost:8080/some/url', headers={'foo': 'bar'})
+        res = session.options(URL + '/some/url', headers={'foo': 'bar'})
         self.assertEqual(res.status_code, 500)
 
 
@@ -140,33 +368,196 @@ class JsonResponses(ServerTest):
     def test_should_respond_with_json(self):
         expected = dict(hello='world')
         server.on('GET', '/').json(expected)
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(json.loads(res.text), expected)
 
     def test_should_set_content_type_responding_with_json(self):
         server.on('GET', '/').json(dict(hello='world'))
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.headers['content-type'], 'application/json')
 
     def test_should_not_change_content_type(self):
         headers = {'content-type': 'text/plain'}
         server.on('GET', '/').json(dict(hello='world'), headers=headers)
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.headers['content-type'], 'text/plain')
 
+    def test_should_respond_with_integers_beyond_64_bits(self):
+        server.on('GET', '/').json(dict(id=2 ** 70))
+        res = session.get(URL)
+        self.assertEqual(json.loads(res.text), dict(id=2 ** 70))
+
+    def test_should_respond_with_non_finite_numbers(self):
+        server.on('GET', '/').json(dict(foo=float('inf'), bar=float('nan')))
+        res = session.get(URL)
+        self.assertEqual(res.text.replace(' ', ''), '{"foo":Infinity,"bar":NaN}')
+
     def test_should_respond_with_json_and_code_201(self):
         server.on('GET', '/').json(dict(foo='bar'), status=201)
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.status_code, 201)
 
 
+class FileResponses(ServerTest):
+    def setUp(self):
+        self.file = tempfile.NamedTemporaryFile()
+        self.file.write(b'file contents' * 10000)
+        self.file.flush()
+
+    def tearDown(self):
+        super().tearDown()
+        self.file.close()
+
+    def test_should_respond_with_file_contents(self):
+        server.on('GET', '/').file(self.file.name)
+        res = session.get(URL)
+        self.assertEqual(res.content, b'file contents' * 10000)
+
+    def test_should_respond_with_file_status_and_headers(self):
+        server.on('GET', '/').file(self.file.name, status=201, headers={'x-foo': 'bar'})
+        res = session.get(URL)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.headers['x-foo'], 'bar')
+        self.assertEqual(res.headers['content-length'], str(len(b'file contents') * 10000))
+
+    def test_should_respond_with_file_size_taken_when_rule_was_defined(self):
+        server.on('GET', '/').file(self.file.name)
+        server.on('GET', '/').text('next')
+        self.file.write(b'appended')
+        self.file.flush()
+        received = exchange(PORT)
+        self.assertNotIn(b'appended', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nnext'))
+
+
 class StatusResponses(ServerTest):
     def test_should_respond_with_status(self):
         server.on('GET', '/').status(400)
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.status_code, 400)
 
     def test_should_respond_with_status_and_headers(self):
         server.on('GET', '/').status(400, headers={'x-foo': 'bar'})
-        res = requests.get('http://localhost:8080')
+        res = session.get(URL)
         self.assertEqual(res.headers['x-foo'], 'bar')
+
+    def test_should_set_content_length(self):
+        server.on('GET', '/').text('hello')
+        res = session.get(URL)
+        self.assertEqual(res.headers['content-length'], '5')
+
+    def test_should_respond_with_unknown_status(self):
+        server.on('GET', '/').status(299)
+        res = session.get(URL)
+        self.assertEqual(res.status_code, 299)
+
+
+@unittest.skipUnless(httptools, 'httptools is not installed')
+class HttptoolsEngine(unittest.TestCase):
+    def tearDown(self):
+        httptools_server.reset()
+
+    def test_should_respond_with_text(self):
+        httptools_server.on('GET', '/').text('hello')
+        res = session.get(HTTPTOOLS_URL)
+        self.assertEqual(res.text, 'hello')
+
+    def test_should_respond_500_if_no_rule_matches(self):
+        res = session.get(HTTPTOOLS_URL)
+        self.assertEqual(res.status_code, 500)
+
+    def test_should_describe_unmatched_request(self):
+        res = session.post(HTTPTOOLS_URL + '/foo', data='bar')
+        self.assertEqual(res.text, 'No matching rule found for POST /foo HTTP/1.1 body bar')
+
+    def test_should_quote_limited_prefix_of_unmatched_request_body(self):
+        res = session.post(HTTPTOOLS_URL + '/foo', data=b'x' * 1000000)
+        self.assertEqual(res.text, 'No matching rule found for POST /foo HTTP/1.1 body '
+                         + 'x' * 65536)
+        httptools_server.on('POST', '/foo').text('hello')
+        res = session.post(HTTPTOOLS_URL + '/foo', data='bar')
+        self.assertEqual(res.text, 'hello')
+
+    def test_should_match_request_headers_and_json_body(self):
+        httptools_server.on(
+            'POST', '/user?name=John', headers={'Authorization': 'Custom'},
+            json=dict(foo='bar')).json(dict(hello='world'), status=201)
+        res = session.post(
+            HTTPTOOLS_URL + '/user?name=John', headers={'Authorization': 'Custom'},
+            data='{ "foo": "bar" }')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.json(), dict(hello='world'))
+
+    def test_should_respond_with_file_contents(self):
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(b'file contents')
+            file.flush()
+            httptools_server.on('GET', '/').file(file.name)
+            res = session.get(HTTPTOOLS_URL)
+        self.assertEqual(res.content, b'file contents')
+
+    def test_should_respond_with_file_size_taken_when_rule_was_defined(self):
+        with tempfile.NamedTemporaryFile() as file:
+            file.write(b'file contents')
+            file.flush()
+            httptools_server.on('GET', '/').file(file.name)
+            httptools_server.on('GET', '/').text('next')
+            file.write(b'appended')
+            file.flush()
+            received = exchange(PORT + 1)
+        self.assertNotIn(b'appended', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nnext'))
+
+    def test_should_ignore_large_request_body(self):
+        httptools_server.on('POST', '/').text('hello')
+        res = session.post(HTTPTOOLS_URL, data=b'x' * 1000000)
+        self.assertEqual(res.text, 'hello')
+
+    def test_should_not_send_body_in_response_to_head(self):
+        httptools_server.on('HEAD', '/').text('head body')
+        httptools_server.on('GET', '/').text('hello')
+        received = exchange(PORT + 1, 'HEAD')
+        self.assertNotIn(b'head body', received)
+        self.assertEqual(received.count(b'HTTP/1.1 200 OK'), 2)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_not_send_no_match_body_in_response_to_head(self):
+        httptools_server.on('GET', '/').text('hello')
+        received = exchange(PORT + 1, 'HEAD')
+        self.assertNotIn(b'No matching rule', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_ignore_upgrade_requests(self):
+        httptools_server.on('GET', '/').text('upgrade')
+        httptools_server.on('GET', '/').text('hello')
+        received = exchange(PORT + 1, first_headers=b'Connection: Upgrade\r\nUpgrade: h2c\r\n')
+        self.assertIn(b'\r\n\r\nupgrade', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_answer_and_close_connect_requests(self):
+        received = send_raw(PORT + 1, b'CONNECT localhost:443 HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        self.assertTrue(received.startswith(b'HTTP/1.1 500 '))
+
+    def test_should_not_send_body_with_no_content_status(self):
+        httptools_server.on('GET', '/').text('oops', status=204)
+        httptools_server.on('GET', '/').text('hello')
+        received = exchange(PORT + 1)
+        self.assertNotIn(b'oops', received)
+        self.assertTrue(received.endswith(b'\r\n\r\nhello'))
+
+    def test_should_close_idle_connections_on_stop(self):
+        stopped = Server(PORT + 3, engine='httptools').start()
+        client = socket.create_connection(('localhost', PORT + 3))
+        try:
+            client.settimeout(5)
+            stopped.stop()
+            self.assertEqual(client.recv(1), b'')
+        finally:
+            client.close()
+
+    def test_should_always_respond_to_matching_queries(self):
+        httptools_server.always('OPTIONS').status(200)
+        res = session.options(HTTPTOOLS_URL + '/some/url')
+        self.assertEqual(res.status_code, 200)
+        res = session.options(HTTPTOOLS_URL + '/some/url')
+        self.assertEqual(res.status_code, 200)